@@ -1,91 +1,208 @@
 
 import sys
 import os
+import argparse
 import json
-import yfinance as yf
-import mibian
+import math
+import re
+import time
 from datetime import datetime
 
-def fetch_option_data(os_ticker):
+# Output lines are encoded with orjson when available (NumPy-aware, much faster)
+try:
+    import orjson
+
+    def dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+except ImportError:
+    def _json_default(obj):
+        import numpy as np
+        if isinstance(obj, np.generic):
+            return obj.item()
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def dumps(obj):
+        return json.dumps(obj, default=_json_default)
+
+# Yahoo's quote endpoint accepts a comma-joined symbol list, so a whole
+# portfolio (options + their underlyings) can be priced in a handful of requests.
+QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+QUOTE_BATCH_SIZE = 20
+
+# The quote endpoint needs a session cookie plus a matching "crumb" token
+COOKIE_URL = "https://fc.yahoo.com"
+CRUMB_URL = "https://query1.finance.yahoo.com/v1/test/getcrumb"
+
+# One pooled keep-alive session for the whole process, so --server requests
+# reuse the TLS connection to Yahoo instead of handshaking every time.
+# Yahoo rejects plain-requests TLS fingerprints, so prefer curl_cffi (installed
+# with yfinance) impersonating a browser.
+try:
+    from curl_cffi import requests as curl_requests
+    _SESSION = curl_requests.Session(impersonate="chrome")
+except ImportError:
+    import requests
+    from requests.adapters import HTTPAdapter
+    _SESSION = requests.Session()
+    _SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    _SESSION.headers['User-Agent'] = 'Mozilla/5.0'
+    _SESSION.headers['Accept-Encoding'] = 'gzip, deflate'
+
+_crumb = None
+
+# OSI ticker: Underlying(1-6) + YYMMDD + C/P + Strike x 1000 (8 digits), e.g. AAPL250117C00150000
+OSI_RE = re.compile(r'^([A-Z]{1,6})(\d{6})([CP])(\d{8})$')
+
+# Underlying quotes are reused for UNDERLYING_TTL seconds so a long-lived
+# --server process doesn't re-quote the same stock for every option on it.
+UNDERLYING_TTL = 30
+_underlying_cache = {}  # symbol -> (time bucket, quote)
+
+MAX_IV_ITERATIONS = 12
+IV_TOLERANCE = 1e-6
+
+def ndtr(x):
+    """
+    Standard normal CDF via the stdlib erfc (accurate in both tails). Avoids
+    importing scipy.special, which dominated this script's startup time.
+    """
+    return 0.5 * math.erfc(-x / math.sqrt(2))
+
+def bs_greeks(S, K, r, T, sigma, is_call):
+    """
+    Closed-form Black-Scholes price and Greeks for a single contract (scalar inputs).
+    r and sigma are decimals, T is in years. Theta is per calendar day and vega
+    per 1 vol point, matching the units mibian reported.
+    """
+    sqrt_t = math.sqrt(T)
+    a = sigma * sqrt_t
+    d1 = (math.log(S / K) + (r + 0.5 * sigma ** 2) * T) / a
+    d2 = d1 - a
+    pdf_d1 = math.exp(-0.5 * d1 * d1) / math.sqrt(2 * math.pi)
+    discounted_k = K * math.exp(-r * T)
+
+    if is_call:
+        price = S * ndtr(d1) - discounted_k * ndtr(d2)
+        delta = ndtr(d1)
+        theta = -S * pdf_d1 * sigma / (2 * sqrt_t) - r * discounted_k * ndtr(d2)
+    else:
+        price = discounted_k * ndtr(-d2) - S * ndtr(-d1)
+        delta = ndtr(d1) - 1
+        theta = -S * pdf_d1 * sigma / (2 * sqrt_t) + r * discounted_k * ndtr(-d2)
+
+    return {
+        "price": price,
+        "delta": delta,
+        "gamma": pdf_d1 / (S * a),
+        "theta": theta / 365,
+        "vega": S * pdf_d1 * sqrt_t / 100
+    }
+
+def bs_implied_vol(price, S, K, r, T, is_call):
+    """
+    Solve for implied volatility (decimal) with Newton-Raphson, using vega as
+    the derivative. Raises ValueError if the solve does not converge.
+    """
+    # Manaster-Koehler start (the price's inflection point in sigma), from which
+    # Newton converges monotonically
+    sigma = max(math.sqrt(2 * abs(math.log(S / K) + r * T) / T), 0.05)
+    for _ in range(MAX_IV_ITERATIONS):
+        g = bs_greeks(S, K, r, T, sigma, is_call)
+        diff = g["price"] - price
+        if abs(diff) < IV_TOLERANCE:
+            return float(sigma)
+        vega = g["vega"] * 100
+        if vega < 1e-8:
+            break
+        sigma = sigma - diff / vega
+        if not (0 < sigma < 10):
+            break
+    raise ValueError("Implied volatility did not converge")
+
+def get_crumb(refresh=False):
+    """
+    Return the Yahoo crumb for this session, fetching the session cookie and a
+    new crumb on first use (or when refresh is set).
+    """
+    global _crumb
+    if _crumb is None or refresh:
+        _crumb = None
+        try:
+            # Sets the session cookie; the page itself answers 404
+            _SESSION.get(COOKIE_URL, timeout=10)
+        except Exception:
+            pass
+        resp = _SESSION.get(CRUMB_URL, timeout=10)
+        resp.raise_for_status()
+        crumb = resp.text.strip()
+        if not crumb or '<' in crumb:
+            raise ValueError("Could not obtain a Yahoo Finance crumb")
+        _crumb = crumb
+    return _crumb
+
+def fetch_quote_batch(batch):
+    """Fetch one batch of quotes, renewing the crumb once if Yahoo rejects it."""
+    for attempt in range(2):
+        params = {"symbols": ",".join(batch), "crumb": get_crumb(refresh=attempt > 0)}
+        resp = _SESSION.get(QUOTE_URL, params=params, timeout=10)
+        if resp.status_code != 401:
+            break
+    resp.raise_for_status()
+    return resp.json().get('quoteResponse', {}).get('result') or []
+
+def fetch_quotes(symbols):
+    """
+    Fetch Yahoo quotes for the given symbols in batches of QUOTE_BATCH_SIZE.
+    Returns (quotes, errors): raw quote results keyed by symbol, and an error
+    message for each symbol whose batch request failed.
+    """
+    quotes, errors = {}, {}
+    unique = list(dict.fromkeys(s for s in symbols if s))
+    for i in range(0, len(unique), QUOTE_BATCH_SIZE):
+        batch = unique[i:i + QUOTE_BATCH_SIZE]
+        try:
+            for quote in fetch_quote_batch(batch):
+                quotes[quote.get('symbol')] = quote
+        except Exception as e:
+            errors.update(dict.fromkeys(batch, str(e)))
+    return quotes, errors
+
+MODES = ('price', 'greeks')
+
+def quote_price(info):
+    return info.get('regularMarketPrice') or info.get('regularMarketOpen') or 0.0
+
+def build_price_result(os_ticker, info):
+    last_price = quote_price(info)
+    if not last_price:
+        return {"status": "error", "symbol": os_ticker, "message": "Price not found"}
+    return {"status": "ok", "symbol": os_ticker, "price": float(last_price)}
+
+def build_option_result(os_ticker, osi_match, info, u_info):
     try:
-        # Example OSI Ticker: AAPL250117C00150000
-        # Parse ticker to get underlying, expiration, strike, type
-        # Format: Ticker(6 chars) + Year(2) + Month(2) + Day(2) + Type(1) + Strike(8)
-        # Note: Underlying ticker length varies. We rely on yfinance parsing for simplicity if possible,
-        # but yf option objects don't always give Greeks easily.
-        # Let's trust yfinance to give us the basic option data first.
-        
-        ticker = yf.Ticker(os_ticker)
-        
+        # Contract terms come from the OSI ticker itself, not the quote
+        underlying_symbol, date_str, type_char, strike_str = osi_match.groups()
+        is_call = type_char == 'C'
+        strike = int(strike_str) / 1000
+        expiry = datetime.strptime(date_str, "%y%m%d")
+
         # 1. Get Option Price & Details
-        # fast_info is good for price, but we need IV for Greeks
-        # .info often contains impliedVolatility
-        info = ticker.info
-        last_price = info.get('regularMarketPrice') or info.get('lastPrice') or info.get('open') or 0.0
-        
-        if not last_price:
-            fast = ticker.fast_info
-            last_price = fast.last_price
+        last_price = quote_price(info)
 
         if not last_price:
-             print(json.dumps({"status": "error", "symbol": os_ticker, "message": "Price not found"}))
-             return
+             return {"status": "error", "symbol": os_ticker, "message": "Price not found"}
 
         # 2. Extract Key Parameters for Black-Scholes
         # We need: Underlying Price, Strike, Interest Rate, Days to Expiry, Volatility
-        
-        # Underlying Symbol extraction (naive approach, works for standard US equity options)
-        # yfinance often stores the underlying symbol in .info['underlyingSymbol']
-        underlying_symbol = info.get('underlyingSymbol')
-        
-        # Fallback parsing if yfinance doesn't give it
-        if not underlying_symbol:
-            # Simple heuristic: remove last 15 chars (digits + type)
-            underlying_symbol = os_ticker[:-15]
-
-        underlying = yf.Ticker(underlying_symbol)
-        try:
-            u_price = underlying.fast_info.last_price
-        except:
-            # Fallback to info
-            u_price = underlying.info.get('regularMarketPrice') or underlying.info.get('lastPrice') or 0.0
+        u_price = u_info.get('regularMarketPrice') or 0.0
 
         if not u_price:
-             print(json.dumps({"status": "error", "symbol": os_ticker, "message": f"Underlying price for {underlying_symbol} not found"}))
-             return
-
-        strike = info.get('strikePrice')
-        if not strike:
-            # Fallback parse strike from ticker
-            try:
-                strike = float(os_ticker[-8:]) / 1000
-            except:
-                print(json.dumps({"status": "error", "message": "Could not determine strike price"}))
-                return
-        
-        # Expiration
-        # expireDate is timestamp in info
-        expire_ts = info.get('expireDate')
-        if expire_ts:
-            expiry = datetime.fromtimestamp(expire_ts)
-        else:
-            # Fallback parsing date from string AAPL[250117]C...
-            try:
-                # Find where digits start after underlying
-                import re
-                match = re.search(r'\d{6}', os_ticker)
-                if match:
-                    date_str = match.group(0)
-                    expiry = datetime.strptime(date_str, "%y%m%d")
-                else:
-                    raise ValueError("No date pattern found")
-            except Exception as e:
-                print(json.dumps({"status": "error", "message": f"Could not determine expiration: {str(e)}"}))
-                return
+             return {"status": "error", "symbol": os_ticker, "message": f"Underlying price for {underlying_symbol} not found"}
 
         days_to_expiry = (expiry - datetime.now()).days
-        # Mibian uses days, but avoid 0 division or issues
+        # Avoid 0 division or issues
         days_calc = max(days_to_expiry, 0.01) # Use small fraction if expiring today
+        t_years = days_calc / 365
 
         # Volatility (IV)
         # Try to use market IV if available, else compute it
@@ -96,53 +213,26 @@ def fetch_option_data(os_ticker):
             r = 4.5
 
         if iv:
-            iv = iv * 100 # Mibian expects percentage (e.g. 25, not 0.25)
+            iv = iv * 100 # Reported as percentage (e.g. 25, not 0.25)
         else:
              # If no IV, we can't calculate Greeks accurately.
-             # but we can try to compute IV using Mibian given the price!
+             # but we can try to solve for IV given the price!
              try:
-                 bs_iv = mibian.BS([u_price, strike, r, days_calc], callPrice=last_price) if 'C' in os_ticker else \
-                         mibian.BS([u_price, strike, r, days_calc], putPrice=last_price)
-                 iv = bs_iv.impliedVolatility
+                 iv = bs_implied_vol(last_price, u_price, strike, r / 100, t_years, is_call) * 100
              except:
                  iv = 30.0 # Extreme fallback
-        
-        # 3. Calculate Greeks using Mibian
-        # BS([UnderlyingPrice, StrikePrice, InterestRate, DaysToExpiration], volatility=x)
-        c = mibian.BS([u_price, strike, r, days_calc], volatility=iv)
-        
-        greeks = {}
-        is_call = 'C' in os_ticker.upper() or info.get('currency') == 'C' # basic check, better check strike logic
-        # Actually parse 'C' or 'P' from ticker if needed, but yf info usually has optionType
-        # Or simplistic check: 
-        if 'P' in os_ticker.split(underlying_symbol)[1] and not 'C' in os_ticker.split(underlying_symbol)[1]:
-             # weak check but let's assume yf info gives us logic or specific fields
-             # Mibian calculates both call and put greeks in the object usually
-             pass
-        
-        # Mibian attributes: .callDelta, .putDelta, .callTheta, etc.
-        # We need to filter based on type.
-        # Ticker format AAPL...C... or P
-        # Let's count back 9 chars: ...[C/P]...
-        type_char = os_ticker[-9]
-        
-        if type_char == 'C':
-            greeks = {
-                "delta": c.callDelta,
-                "theta": c.callTheta,
-                "gamma": c.gamma, # Gamma is same for both
-                "vega": c.vega
-            }
-        else:
-            greeks = {
-                "delta": c.putDelta,
-                "theta": c.putTheta,
-                "gamma": c.gamma,
-                "vega": c.vega
-            }
+
+        # 3. Calculate Greeks (closed-form Black-Scholes)
+        g = bs_greeks(u_price, strike, r / 100, t_years, iv / 100, is_call)
+        greeks = {
+            "delta": g["delta"],
+            "theta": g["theta"],
+            "gamma": g["gamma"], # Gamma is same for both
+            "vega": g["vega"]
+        }
 
         # 4. Output
-        output = {
+        return {
             "status": "ok",
             "symbol": os_ticker,
             "price": float(last_price),
@@ -150,25 +240,101 @@ def fetch_option_data(os_ticker):
             "greeks": greeks,
             "iv": float(iv)
         }
-        print(json.dumps(output))
-        sys.stdout.flush()
 
     except Exception as e:
-        # Check if it's a 404/Quote not found specifically if possible or just log message
-        msg = str(e)
-        if "Quote not found" in msg or "404" in msg:
-             msg = f"Ticker {os_ticker} not found on Yahoo Finance. Check if symbol/strike/expiry are correct."
-        
-        print(json.dumps({
+        return {
             "status": "error",
             "symbol": os_ticker,
-            "message": msg
-        }))
+            "message": str(e)
+        }
+
+def fetch_option_data(os_tickers, mode='greeks'):
+    """
+    Price a list of OSI tickers, printing one JSON line per ticker (in input order).
+    Options and underlyings are quoted together so N options cost ceil(N/20) requests.
+    In 'price' mode only the options are quoted and Greeks are skipped.
+    """
+    matches = [OSI_RE.match(t) for t in os_tickers]
+    underlyings = [m.group(1) for m in matches if m] if mode == 'greeks' else []
+
+    # Drop cached underlyings from a previous window, then reuse the rest
+    bucket = int(time.time() // UNDERLYING_TTL)
+    for symbol in [s for s, (b, _) in _underlying_cache.items() if b != bucket]:
+        del _underlying_cache[symbol]
+    cached = {s: q for s, (_, q) in _underlying_cache.items()}
+
+    options = [t for t, m in zip(os_tickers, matches) if m]
+    quotes, errors = fetch_quotes(options + [s for s in underlyings if s not in cached])
+    quotes.update(cached)
+
+    for symbol in set(underlyings):
+        if symbol in quotes and symbol not in cached:
+            _underlying_cache[symbol] = (bucket, quotes[symbol])
+
+    for os_ticker, m in zip(os_tickers, matches):
+        info = quotes.get(os_ticker)
+        if not m:
+            result = {
+                "status": "error",
+                "symbol": os_ticker,
+                "message": f"Ticker {os_ticker} is not a valid OSI option symbol (e.g. AAPL250117C00150000)."
+            }
+        elif os_ticker in errors or m.group(1) in errors:
+            # Only the tickers whose quote (or underlying's quote) request failed
+            result = {
+                "status": "error",
+                "symbol": os_ticker,
+                "message": errors.get(os_ticker) or errors[m.group(1)]
+            }
+        elif not info:
+            result = {
+                "status": "error",
+                "symbol": os_ticker,
+                "message": f"Ticker {os_ticker} not found on Yahoo Finance. Check if symbol/strike/expiry are correct."
+            }
+        elif mode == 'price':
+            result = build_price_result(os_ticker, info)
+        else:
+            result = build_option_result(os_ticker, m, info, quotes.get(m.group(1), {}))
+        print(dumps(result))
+
+    sys.stdout.flush()
+
+def parse_tickers(arg):
+    # OSI symbols are upper case; accept lower-case input as yfinance did
+    return [t.strip().upper() for t in arg.split(',') if t.strip()]
+
+def serve(default_mode):
+    """
+    Long-lived worker: one request per stdin line, so interpreter and import
+    startup is paid once per process. A line is a ticker or comma-separated
+    list, optionally prefixed with a mode, e.g. "price AAPL250117C00150000".
+    """
+    for line in sys.stdin:
+        parts = line.split(None, 1)
+        mode, rest = default_mode, line
+        if parts and parts[0] in MODES:
+            # Only a leading mode word is split off; the list itself may contain spaces
+            mode, rest = parts[0], parts[1] if len(parts) > 1 else ''
+        tickers = parse_tickers(rest)
+        if tickers:
+            fetch_option_data(tickers, mode)
+        else:
+            # Every request gets a reply line, so a client waiting on one never hangs
+            print(dumps({"status": "error", "message": "Ticker argument required"}))
+            sys.stdout.flush()
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print(json.dumps({"status": "error", "message": "Ticker argument required"}))
+    parser = argparse.ArgumentParser(description="Fetch option prices and Black-Scholes Greeks from Yahoo Finance")
+    parser.add_argument('tickers', nargs='?', help="OSI ticker or comma-separated list, e.g. AAPL250117C00150000")
+    parser.add_argument('--mode', choices=MODES, default='greeks', help="price only, or price plus Greeks (default)")
+    parser.add_argument('--server', action='store_true', help="read requests from stdin, one per line")
+    args = parser.parse_args()
+
+    if args.server:
+        serve(args.mode)
+    elif not args.tickers:
+        print(dumps({"status": "error", "message": "Ticker argument required"}))
         sys.exit(1)
-    
-    ticker = sys.argv[1]
-    fetch_option_data(ticker)
+    else:
+        fetch_option_data(parse_tickers(args.tickers), args.mode)
@@ -1,27 +1,331 @@
 
 import sys
+import os
 import json
+import time
+import stat
+import string
+import hashlib
+import tempfile
+import threading
+import joblib
+from concurrent.futures import Future
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import HistGradientBoostingClassifier
+
+# orjson encodes several times faster and handles NumPy scalars natively;
+# the stdlib encoder is the fallback when it isn't installed
+try:
+    import orjson
+
+    def dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+except ImportError:
+    def _json_default(obj):
+        if isinstance(obj, np.generic):
+            return obj.item()
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def dumps(obj):
+        return json.dumps(obj, default=_json_default)
+
+# Numba compiles the feature kernel to machine code (cached on disk after the
+# first run); without it the same loops simply run as plain Python
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        return lambda func: func
 
 # News sentiment imports
 try:
     import yfinance as yf
+    from vaderSentiment import vaderSentiment as vader
     from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
     HAS_SENTIMENT = True
 except ImportError:
     HAS_SENTIMENT = False
 
-def calculate_rsi(data, window=14):
-    delta = data.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-    rs = gain / loss
-    return 100 - (100 / (1 + rs))
+# Build the analyzer (which parses the VADER lexicon files) once per process
+_ANALYZER = SentimentIntensityAnalyzer() if HAS_SENTIMENT else None
 
-def calculate_ema(data, window):
-    return data.ewm(span=window, adjust=False).mean()
+if HAS_SENTIMENT:
+    # Lexicon tables for the vectorized headline scorer. Words that trigger VADER's
+    # contextual rules (negation, boosters, "but", "least", idioms...) send a
+    # headline through the full polarity_scores() engine instead.
+    _VADER_LEXICON = _ANALYZER.lexicon
+    _VADER_EMOJIS = _ANALYZER.emojis
+    _VADER_MODIFIERS = (set(vader.NEGATE) | {w for w in vader.BOOSTER_DICT if ' ' not in w}
+                        | {"no", "but", "least", "kind", "so", "this", "never", "without"})
+    _VADER_PHRASES = list(vader.SPECIAL_CASES) + [w for w in vader.BOOSTER_DICT if ' ' in w]
+
+HORIZONS = (2, 5, 10, 60, 250)
+RSI_WINDOW = 14
+
+# Fitted models are cached on disk so repeat requests on an unchanged history skip training.
+# Bump MODEL_VERSION whenever the features or hyperparameters change.
+MODEL_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'predict_cache')
+MODEL_CACHE_TTL = 24 * 60 * 60
+MODEL_VERSION = 2
+
+# How long to wait for the background news and market-indicator fetches once
+# the model is ready (both are measured from the same moment)
+NEWS_TIMEOUT = 3.0
+INDICATORS_TIMEOUT = 3.0
+# Number of most recent headlines scored
+NEWS_COUNT = 10
+# Headlines are cached (in MODEL_CACHE_DIR) so repeat predictions skip Yahoo
+NEWS_CACHE_TTL = 15 * 60
+
+# Sentiment bands for classify_sentiment(). With side='right', a score equal to a
+# threshold falls in the band above it, so inclusive lower bounds are nudged up
+# one ulp: headline <= -0.05 is Bearish, >= 0.05 Bullish; combined < 0.45 is
+# Bearish, > 0.55 Bullish.
+SENTIMENT_LABELS = np.array(["Bearish", "Neutral", "Bullish"])
+HEADLINE_THRESHOLDS = np.array([np.nextafter(-0.05, 1), 0.05])
+AGGREGATE_THRESHOLDS = np.array([np.nextafter(-0.1, 1), 0.1])
+COMBINED_THRESHOLDS = np.array([0.45, np.nextafter(0.55, 1)])
+
+@njit(cache=True, error_model='numpy')
+def build_features(close, target, horizons):
+    """
+    Compute every price-derived predictor in one pass over the close series.
+    Columns: EMA9, EMA21, then Close_Ratio_h / Trend_h per horizon, then RSI.
+    Rows without a full window are NaN, matching the old pandas rolling output.
+    Arithmetic runs in float64; the matrix is written directly as float32.
+    """
+    n = close.shape[0]
+    n_cols = 3 + 2 * horizons.shape[0]
+    out = np.full((n, n_cols), np.nan, dtype=np.float32)
+
+    # EMA Indicators (span-based, adjust=False recursion)
+    col = 0
+    for span in (9, 21):
+        alpha = 2.0 / (span + 1.0)
+        e = close[0]
+        out[0, col] = e
+        for i in range(1, n):
+            e = alpha * close[i] + (1.0 - alpha) * e
+            out[i, col] = e
+        col += 1
+
+    # Rolling close ratio and trailing count of up-days. One prefix sum of close
+    # and one of Target serve every horizon: each window is a single difference.
+    close_cs = np.zeros(n + 1)
+    target_cs = np.zeros(n + 1)
+    for i in range(n):
+        close_cs[i + 1] = close_cs[i] + close[i]
+        target_cs[i + 1] = target_cs[i] + target[i]
+
+    for h in horizons:
+        for i in range(h - 1, n):
+            out[i, col] = close[i] / ((close_cs[i + 1] - close_cs[i + 1 - h]) / h)
+        # Trend_h counts up-days over the h days before i (Target shifted by 1)
+        for i in range(h, n):
+            out[i, col + 1] = target_cs[i] - target_cs[i - h]
+        col += 2
+
+    # RSI from simple rolling means of gains/losses (first diff counts as 0)
+    gain_sum = 0.0
+    loss_sum = 0.0
+    for i in range(n):
+        delta = close[i] - close[i - 1] if i > 0 else 0.0
+        gain_sum += max(delta, 0.0)
+        loss_sum += max(-delta, 0.0)
+        if i >= RSI_WINDOW:
+            old = close[i - RSI_WINDOW] - close[i - RSI_WINDOW - 1] if i > RSI_WINDOW else 0.0
+            gain_sum -= max(old, 0.0)
+            loss_sum -= max(-old, 0.0)
+        if i >= RSI_WINDOW - 1 and gain_sum + loss_sum > 0:
+            out[i, col] = 100.0 * gain_sum / (gain_sum + loss_sum)
+
+    return out
+
+def private_cache_dir():
+    """
+    Return MODEL_CACHE_DIR, creating it owner-only (0700). Cached models are
+    unpickled, so if the path is a symlink or belongs to another user, return
+    None and run without the cache.
+    """
+    try:
+        os.makedirs(MODEL_CACHE_DIR, mode=0o700, exist_ok=True)
+        st = os.lstat(MODEL_CACHE_DIR)
+        if not stat.S_ISDIR(st.st_mode):
+            return None
+        if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+            return None
+        if st.st_mode & 0o077:
+            os.chmod(MODEL_CACHE_DIR, 0o700)
+    except OSError:
+        return None
+    return MODEL_CACHE_DIR
+
+def evict_stale_models():
+    """Remove cached models and headlines older than MODEL_CACHE_TTL."""
+    cache_dir = private_cache_dir()
+    if cache_dir is None:
+        return
+    cutoff = time.time() - MODEL_CACHE_TTL
+    try:
+        with os.scandir(cache_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+    except FileNotFoundError:
+        pass
+
+def load_or_train_model(symbol, last_date, X_train, y_train):
+    """
+    Return a fitted model for this exact training window, loading it from the
+    on-disk cache when the (model version, symbol, last date, row count) key
+    has been seen.
+    """
+    cache_dir = private_cache_dir()
+    key = hashlib.blake2b(f"{MODEL_VERSION}|{symbol}|{last_date}|{len(X_train)}".encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"hgb_{key}.joblib") if cache_dir else None
+
+    if path:
+        try:
+            return joblib.load(path)
+        except Exception:
+            pass
+
+    # Histogram-based boosting: features are binned once, trees are shallow.
+    # Daily direction is mostly noise, so leaves are kept large and heavily
+    # shrunk (the role min_samples_split=100 played for the random forest);
+    # otherwise the probabilities drift far from 0.5 on random-walk histories.
+    model = HistGradientBoostingClassifier(max_iter=100, max_leaf_nodes=4, min_samples_leaf=100,
+                                           l2_regularization=10.0, learning_rate=0.03,
+                                           early_stopping=False, random_state=1)
+    model.fit(X_train, y_train)
+
+    if not path:
+        return model
+
+    try:
+        # Write then rename so a concurrent reader never sees a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(model, tmp_path, compress=0)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+    return model
+
+def load_or_fetch_headlines(symbol):
+    """
+    Return the NEWS_COUNT most recent (title, published) pairs for symbol,
+    reading them from the on-disk cache when fetched within NEWS_CACHE_TTL.
+    """
+    cache_dir = private_cache_dir()
+    # The symbol comes from the caller, so hash it rather than use it as a file name
+    key = hashlib.blake2b(symbol.upper().encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"news_{key}.json") if cache_dir else None
+
+    try:
+        if path and time.time() - os.path.getmtime(path) < NEWS_CACHE_TTL:
+            with open(path) as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    # Ask Yahoo for only the headlines we score, and keep just (title, published)
+    # so the full article dicts (thumbnails, related tickers...) can be freed early
+    news = yf.Ticker(symbol).get_news(count=NEWS_COUNT)[:NEWS_COUNT]
+    items = []
+    for item in news:
+        # yfinance returns nested structure: item['content']['title']
+        content = item.get('content', item)  # Handle both old and new API format
+        title = content.get('title', '') if isinstance(content, dict) else item.get('title', '')
+        published = content.get('pubDate', item.get('providerPublishTime', 0)) if isinstance(content, dict) else item.get('providerPublishTime', 0)
+
+        if title:
+            items.append((title, published))
+    del news
+
+    if not path:
+        return items
+
+    try:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(dumps(items))
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+    return items
+
+def run_in_background(fn, *args):
+    """
+    Run fn(*args) on a daemon thread and return a Future for its result. Unlike
+    ThreadPoolExecutor workers, daemon threads are not joined at interpreter
+    exit, so a slow lookup can't hold the process open once the result is printed.
+    """
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+def classify_sentiment(scores, thresholds):
+    """Map a score (or array of scores) to Bearish/Neutral/Bullish without branching."""
+    return SENTIMENT_LABELS[np.searchsorted(thresholds, scores, side='right')].tolist()
+
+def vader_tokens(title):
+    """
+    Tokenize a headline the way VADER does, lowercased. Returns None when the
+    headline uses any rule beyond a plain lexicon sum (modifiers, idioms,
+    emphasis punctuation, ALL-CAPS sentiment words, emoji).
+    """
+    if '!' in title or title.count('?') > 1 or any(ch in _VADER_EMOJIS for ch in title):
+        return None
+    tokens = []
+    for raw in title.split():
+        stripped = raw.strip(string.punctuation)
+        token = stripped if len(stripped) > 2 else raw
+        lower = token.lower()
+        if lower in _VADER_MODIFIERS or "n't" in lower or (token.isupper() and lower in _VADER_LEXICON):
+            return None
+        tokens.append(lower)
+    joined = ' '.join(tokens)
+    if any(phrase in joined for phrase in _VADER_PHRASES):
+        return None
+    return tokens
+
+def score_headlines(titles):
+    """
+    VADER compound score for each title. Plain headlines are scored together:
+    one lexicon lookup over a flat word array, a segment sum per headline and
+    VADER's score/sqrt(score^2 + 15) normalization.
+    """
+    compound = np.zeros(len(titles))
+    words, segments, plain = [], [], []
+
+    for i, title in enumerate(titles):
+        tokens = vader_tokens(title)
+        if tokens is None:
+            compound[i] = _ANALYZER.polarity_scores(title)['compound']
+        else:
+            words += tokens
+            segments += [len(plain)] * len(tokens)
+            plain.append(i)
+
+    if plain:
+        valences = np.array([_VADER_LEXICON.get(w, 0.0) for w in words])
+        sums = np.bincount(np.array(segments, dtype=np.int64), weights=valences, minlength=len(plain))
+        compound[plain] = np.round(sums / np.sqrt(sums * sums + 15), 4)
+
+    return compound
 
 def fetch_news_sentiment(symbol):
     """
@@ -38,10 +342,9 @@ def fetch_news_sentiment(symbol):
         }
     
     try:
-        ticker = yf.Ticker(symbol)
-        news = ticker.news
-        
-        if not news:
+        items = load_or_fetch_headlines(symbol)
+
+        if not items:
             return {
                 "available": True,
                 "aggregate_score": 0,
@@ -51,50 +354,26 @@ def fetch_news_sentiment(symbol):
                 "message": "No recent news found"
             }
         
-        analyzer = SentimentIntensityAnalyzer()
         headlines_with_sentiment = []
-        compound_scores = []
-        
-        # Process up to 10 most recent headlines
-        for item in news[:10]:
-            # yfinance returns nested structure: item['content']['title']
-            content = item.get('content', item)  # Handle both old and new API format
-            title = content.get('title', '') if isinstance(content, dict) else item.get('title', '')
-            published = content.get('pubDate', item.get('providerPublishTime', 0)) if isinstance(content, dict) else item.get('providerPublishTime', 0)
-            
-            if title:
-                scores = analyzer.polarity_scores(title)
-                compound = scores['compound']
-                compound_scores.append(compound)
-                
-                # Determine individual headline sentiment
-                if compound >= 0.05:
-                    sent_label = "Bullish"
-                elif compound <= -0.05:
-                    sent_label = "Bearish"
-                else:
-                    sent_label = "Neutral"
-                
-                headlines_with_sentiment.append({
-                    "title": title[:120],  # Truncate long titles
-                    "score": round(compound, 3),
-                    "sentiment": sent_label,
-                    "published": published
-                })
-        
+        titles, published_times = zip(*items)
+
+        # Score every headline in one batch
+        compound_scores = score_headlines(titles)
+        sent_labels = classify_sentiment(compound_scores, HEADLINE_THRESHOLDS)
+
+        for title, published, compound, sent_label in zip(titles, published_times, compound_scores.tolist(), sent_labels):
+            headlines_with_sentiment.append({
+                "title": title[:120],  # Truncate long titles
+                "score": round(compound, 3),
+                "sentiment": sent_label,
+                "published": published
+            })
+
         # Calculate aggregate sentiment
-        if compound_scores:
-            avg_score = sum(compound_scores) / len(compound_scores)
-        else:
-            avg_score = 0
+        avg_score = float(compound_scores.mean()) if len(compound_scores) else 0
         
         # Determine overall sentiment
-        if avg_score >= 0.1:
-            overall_sentiment = "Bullish"
-        elif avg_score <= -0.1:
-            overall_sentiment = "Bearish"
-        else:
-            overall_sentiment = "Neutral"
+        overall_sentiment = classify_sentiment(avg_score, AGGREGATE_THRESHOLDS)
         
         return {
             "available": True,
@@ -238,81 +517,97 @@ def process_and_predict():
         symbol = json_data.get('symbol', 'UNKNOWN') if isinstance(json_data, dict) else 'UNKNOWN'
         price_data = json_data.get('data', json_data) if isinstance(json_data, dict) else json_data
         
-        # Fetch news sentiment
-        news_sentiment = fetch_news_sentiment(symbol)
-        
-        # Fetch market indicators (VIX, 52-week, analyst targets, Fear & Greed)
-        market_indicators = fetch_market_indicators(symbol)
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(price_data)
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date')
-        df.set_index('date', inplace=True)
-        
-        # Feature Engineering
-        df['Close_Shift_1'] = df['close'].shift(1)
-        df['Open_Shift_1'] = df['open'].shift(1)
-        
-        # EMA Indicators
-        df['EMA9'] = calculate_ema(df['close'], 9)
-        df['EMA21'] = calculate_ema(df['close'], 21)
-        
+        # News sentiment and market indicators (VIX, 52-week, analyst targets, Fear & Greed)
+        # are network-bound, so fetch them in the background while the model trains
+        news_future = run_in_background(fetch_news_sentiment, symbol)
+        indicators_future = run_in_background(fetch_market_indicators, symbol)
+
+        # Only date and close are used, so read them straight into arrays
+        # (sorted by date) rather than materializing a DataFrame of every field
+        dates = pd.to_datetime([row['date'] for row in price_data])
+        close = np.array([row.get('close') for row in price_data], dtype=np.float64)
+
+        # A missing close would poison the EMA and prefix-sum recursions for every
+        # later bar, so drop those days (with their dates) before building features
+        has_close = np.isfinite(close)
+        if not has_close.all():
+            dates, close = dates[has_close], close[has_close]
+        if not len(close):
+            raise ValueError("No valid close prices in input data")
+
+        order = np.argsort(dates.values, kind='stable')
+        close = close[order]
+        last_date = dates[order[-1]]
+
+        # Feature Engineering: float32 predictor matrix, int8 labels
+
         # Target: 1 if Price went UP next day
-        df['Target'] = (df['close'].shift(-1) > df['close']).astype(int)
-        
-        # Rolling Averages / Windows
-        horizons = [2, 5, 10, 60, 250]
-        predictors = ['EMA9', 'EMA21']
-        
-        for horizon in horizons:
-            rolling_averages = df.rolling(horizon).mean()
-            
-            ratio_column = f"Close_Ratio_{horizon}"
-            df[ratio_column] = df['close'] / rolling_averages['close']
-            
-            trend_column = f"Trend_{horizon}"
-            df[trend_column] = df.shift(1).rolling(horizon).sum()['Target']
-            
-            predictors += [ratio_column, trend_column]
+        target = np.zeros(len(close), dtype=np.int8)
+        target[:-1] = close[1:] > close[:-1]
 
-        # Additional Indicators
-        df['RSI'] = calculate_rsi(df['close'])
+        predictors = ['EMA9', 'EMA21']
+        for horizon in HORIZONS:
+            predictors += [f"Close_Ratio_{horizon}", f"Trend_{horizon}"]
         predictors.append('RSI')
-        
-        # Add news sentiment as a feature (constant for all rows in current dataset)
-        # This represents current market sentiment from recent news
-        sentiment_score = news_sentiment.get('aggregate_score', 0)
-        df['News_Sentiment'] = sentiment_score
-        predictors.append('News_Sentiment')
 
-        # Drop NaNs created by rolling/shifting
-        df_clean = df.dropna()
+        # News sentiment is a single current value, not a per-day series: as a
+        # constant column it could never produce a split, so the model doesn't
+        # wait on it and it only feeds the combined score below
+        X = build_features(close, target, np.array(HORIZONS, dtype=np.int64))
 
-        if len(df_clean) < 50:
+        # Rows before the longest window are warm-up; RSI can also be undefined
+        # further in (flat prices), so drop those rows the way dropna() did
+        start_idx = max(HORIZONS)
+        X_valid, y_valid = X[start_idx:], target[start_idx:]
+        valid = np.isfinite(X_valid).all(axis=1)
+        if len(valid) and not valid[-1]:
+            # Predicting from an older row would silently report stale features
+            raise ValueError("Features for the latest bar are undefined; cannot predict")
+        if not valid.all():
+            X_valid, y_valid = X_valid[valid], y_valid[valid]
+
+        if len(X_valid) < 50:
              # Not enough data for robust ML training on this specific history
              raise ValueError("Insufficient data points after preprocessing for ML")
 
-        # Split Train/Test (Last 100 days as 'test' simulation, rest as train)
-        # Or standard split. Given users want "Calculated/Simulated" data...
         # We will train on ALL available data except the very last row (which is today/latest)
         # Then predict for the "Next Day".
 
-        model = RandomForestClassifier(n_estimators=100, min_samples_split=100, random_state=1)
-        
         # Training
-        train = df_clean.iloc[:-1] # All except last
-        test = df_clean.iloc[-1:]  # Last row (Current state to predict Next)
-        
-        model.fit(train[predictors], train['Target'])
-        
+        X_train, y_train = X_valid[:-1], y_valid[:-1] # All except last
+        X_test = X_valid[-1:]  # Last row (Current state to predict Next)
+        test = dict(zip(predictors, X_test[0]))
+
+        model = load_or_train_model(symbol, last_date, X_train, y_train)
+
         # Prediction
-        preds = model.predict_proba(test[predictors])[:, 1] # Probability of UP
+        preds = model.predict_proba(X_test)[:, 1] # Probability of UP
         preds_binary = (preds >= 0.6).astype(int) # High threshold for "Buy"
         
         # Simply return the prediction and probabilities
         probability_up = float(preds[0])
-        
+
+        wait_start = time.monotonic()
+        try:
+            news_sentiment = news_future.result(timeout=NEWS_TIMEOUT)
+        except Exception as e:
+            news_sentiment = {
+                "available": False,
+                "error": f"News sentiment unavailable: {str(e) or 'timed out'}",
+                "aggregate_score": 0,
+                "sentiment": "Neutral",
+                "headlines": []
+            }
+        sentiment_score = news_sentiment.get('aggregate_score', 0)
+        try:
+            remaining = INDICATORS_TIMEOUT - (time.monotonic() - wait_start)
+            market_indicators = indicators_future.result(timeout=max(remaining, 0.0))
+        except Exception as e:
+            market_indicators = {
+                "available": False,
+                "error": f"Market indicators unavailable: {str(e) or 'timed out'}"
+            }
+
         # Combine ML sentiment with news sentiment for final verdict
         combined_score = probability_up
         if news_sentiment.get('available', False):
@@ -320,35 +615,31 @@ def process_and_predict():
             news_normalized = (sentiment_score + 1) / 2  # Convert -1 to 1 range to 0 to 1
             combined_score = 0.7 * probability_up + 0.3 * news_normalized
         
-        if combined_score > 0.55:
-            sentiment = "Bullish"
-        elif combined_score < 0.45:
-            sentiment = "Bearish"
-        else:
-            sentiment = "Neutral"
+        sentiment = classify_sentiment(combined_score, COMBINED_THRESHOLDS)
         
         result = {
             "prediction_probability_up": probability_up,
             "combined_score": round(combined_score, 3),
             "sentiment": sentiment,
             "features": {
-                "rsi": float(test['RSI'].iloc[0]) if not pd.isna(test['RSI'].iloc[0]) else 0,
-                "close_ratio_5": float(test['Close_Ratio_5'].iloc[0]),
-                "trend_5": float(test['Trend_5'].iloc[0]),
+                "rsi": test['RSI'] if not np.isnan(test['RSI']) else 0,
+                "close_ratio_5": test['Close_Ratio_5'],
+                "trend_5": test['Trend_5'],
                 "news_sentiment": sentiment_score
             },
             "news_analysis": news_sentiment,
             "market_indicators": market_indicators
         }
         
-        print(json.dumps(result))
+        print(dumps(result))
 
     except Exception as e:
         error_response = {
             "error": str(e)
         }
-        print(json.dumps(error_response))
+        print(dumps(error_response))
         sys.exit(1)
 
 if __name__ == "__main__":
+    evict_stale_models()
     process_and_predict()